@@ -1,7 +1,11 @@
 import os
 import time
+import sqlite3
+import threading
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import DeclarativeBase
 import shutil
 
@@ -13,7 +17,7 @@ app = Flask(__name__)
 
 # Configuration
 app.secret_key = os.environ.get("FLASK_SECRET_KEY") or "viral-content-generator-key"
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///viral_content.db"
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("VIRAL_DATABASE_URI", "sqlite:///viral_content.db")
 app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_pre_ping": True,
 }
@@ -31,7 +35,8 @@ if os.path.exists(db_path):
     os.chmod(db_path, 0o666)
     os.chmod('instance', 0o777)
 
-# Cleanup function for temporary files
+# One-off cleanup for files saved before artifacts were tracked;
+# tracked files are removed by the artifact janitor
 def cleanup_old_files():
     """Clean up files older than 24 hours"""
     uploads_dir = app.config["UPLOAD_FOLDER"]
@@ -47,10 +52,67 @@ def cleanup_old_files():
                     except OSError:
                         pass
 
+# SQLite tuning: WAL lets readers run while an upload is writing
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA cache_size=-20000")  # 20MB page cache
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=134217728")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
 # Initialize extensions
 db.init_app(app)
 
-with app.app_context():
-    import models
-    db.create_all()
-    cleanup_old_files()  # Clean up old files on startup
+# Schema setup and the artifact janitor start on the first request instead of at import,
+# so importing the app (web workers, CLI, benchmarks) stays cheap
+_initialized = False
+_init_lock = threading.Lock()
+
+def init_app_state():
+    """Create database tables and start the artifact janitor (once per process)"""
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        with app.app_context():
+            import models
+            db.create_all()
+            models.upgrade_schema()
+        import artifacts
+        artifacts.start_janitor(app)
+        _initialized = True
+
+@app.before_request
+def ensure_initialized():
+    init_app_state()
+
+@app.cli.command("init-db")
+def init_db_command():
+    """Create database tables"""
+    with app.app_context():
+        import models
+        db.create_all()
+        models.upgrade_schema()
+
+@app.cli.command("backfill-generations")
+def backfill_generations_command():
+    """Move generated content of older Content rows into the generation table"""
+    with app.app_context():
+        import models
+        models.upgrade_schema()
+        moved = models.backfill_generations()
+    print(f"Moved {moved} rows")
+
+@app.cli.command("cleanup-legacy-files")
+def cleanup_legacy_files_command():
+    """Remove untracked upload files older than 24 hours"""
+    cleanup_old_files()
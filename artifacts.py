@@ -0,0 +1,202 @@
+import os
+import uuid
+import time
+import shutil
+import logging
+import tempfile
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# How long each kind of artifact is kept before the janitor removes it
+ARTIFACT_TTLS = {
+    'upload': int(os.environ.get("ARTIFACT_TTL_SECONDS", 86400)),
+    'output': int(os.environ.get("ARTIFACT_TTL_SECONDS", 86400)),
+    'intermediate': int(os.environ.get("INTERMEDIATE_TTL_SECONDS", 3600)),
+    'profile': int(os.environ.get("PROFILE_TTL_SECONDS", 7 * 86400)),
+}
+JOB_TEMP_ROOT = os.environ.get("JOB_TEMP_DIR", os.path.join("instance", "tmp"))
+JANITOR_INTERVAL = int(os.environ.get("JANITOR_INTERVAL_SECONDS", 300))
+JANITOR_BATCH_SIZE = int(os.environ.get("JANITOR_BATCH_SIZE", 500))
+
+_current_job = contextvars.ContextVar("viral_job", default=None)
+
+class Job:
+    """One upload's id plus its private temp directory"""
+
+    def __init__(self, job_id, temp_dir):
+        self.id = job_id
+        self.temp_dir = temp_dir
+        self.registered = False
+
+def current_job():
+    return _current_job.get()
+
+@contextmanager
+def job(job_id=None):
+    """
+    Run a pipeline as a job with an isolated temp directory.
+
+    Usable as a context manager or a view decorator; the job id defaults
+    to the request id of the current metrics trace.
+
+    Artifacts are recorded as soon as they are registered, so files of a
+    worker killed mid-job still expire; their sizes are filled in when the
+    job ends. The temp directory is removed here, or by the janitor if the
+    worker dies first.
+    """
+    if job_id is None:
+        from metrics import current_trace
+        trace = current_trace()
+        job_id = trace["request_id"] if trace else uuid.uuid4().hex
+    os.makedirs(JOB_TEMP_ROOT, exist_ok=True)
+    current = Job(job_id, tempfile.mkdtemp(prefix=f"job_{job_id}_", dir=JOB_TEMP_ROOT))
+    token = _current_job.set(current)
+    try:
+        yield current
+    finally:
+        _current_job.reset(token)
+        shutil.rmtree(current.temp_dir, ignore_errors=True)
+        try:
+            _update_sizes(current)
+        except Exception as e:
+            logger.error(f"Error updating artifact sizes for job {job_id}: {str(e)}")
+
+def temp_path(name):
+    """Path for a temporary file inside the current job's temp directory (None outside a job)"""
+    current = _current_job.get()
+    if current is None:
+        return None
+    return os.path.join(current.temp_dir, name)
+
+def register(path, kind='output'):
+    """Record a file of the current job in the Artifact table so it expires after its TTL"""
+    current = _current_job.get()
+    if current is None or not path:
+        return
+    try:
+        _record(current.id, path, kind)
+        current.registered = True
+    except Exception as e:
+        logger.error(f"Error recording artifact {path}: {str(e)}")
+
+def track(path, kind, job_id):
+    """Record a file written outside a job context (e.g. a profile dump) with its current size"""
+    try:
+        _record(job_id, path, kind, size=os.path.getsize(path) if os.path.exists(path) else 0)
+    except Exception as e:
+        logger.error(f"Error recording artifact {path}: {str(e)}")
+
+def _record(job_id, path, kind, size=0):
+    from sqlalchemy.orm import Session
+    from app import db
+    from models import Artifact
+
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ARTIFACT_TTLS.get(kind, ARTIFACT_TTLS['output']))
+    # Own session, committed immediately: independent of the request's
+    # transaction and durable if the worker is killed mid-encode
+    with Session(db.engine) as session:
+        artifact = session.query(Artifact).filter_by(path=path).first()
+        if artifact is None:
+            artifact = Artifact()
+            artifact.path = path
+            artifact.job_id = job_id
+            artifact.kind = kind
+            artifact.size = size
+            artifact.created_at = now
+            artifact.expires_at = expires_at
+            session.add(artifact)
+        elif artifact.expires_at < expires_at:
+            # Registered again with a longer lived kind (e.g. audio reused for a combined video)
+            artifact.kind = kind
+            artifact.expires_at = expires_at
+        session.commit()
+
+def _update_sizes(current):
+    if not current.registered:
+        return
+    from sqlalchemy.orm import Session
+    from app import db
+    from models import Artifact
+
+    with Session(db.engine) as session:
+        for artifact in session.query(Artifact).filter_by(job_id=current.id):
+            artifact.size = os.path.getsize(artifact.path) if os.path.exists(artifact.path) else 0
+        session.commit()
+
+def purge_expired(batch_size=None, now=None):
+    """Delete expired artifacts in batches; returns the number removed"""
+    from app import db
+    from models import Artifact
+
+    batch_size = batch_size or JANITOR_BATCH_SIZE
+    now = now or datetime.utcnow()
+    removed = 0
+    while True:
+        batch = (Artifact.query
+                 .filter(Artifact.expires_at <= now)
+                 .order_by(Artifact.expires_at)
+                 .limit(batch_size)
+                 .all())
+        if not batch:
+            break
+        for artifact in batch:
+            try:
+                os.remove(artifact.path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                # Retry on a later pass instead of selecting it again in this one
+                logger.error(f"Error removing artifact {artifact.path}: {str(e)}")
+                artifact.expires_at = now + timedelta(seconds=JANITOR_INTERVAL)
+                continue
+            db.session.delete(artifact)
+            removed += 1
+        db.session.commit()
+        if len(batch) < batch_size:
+            break
+    if removed:
+        logger.info(f"Janitor removed {removed} expired artifacts")
+    return removed
+
+def purge_stale_temp_dirs(now=None):
+    """Remove job temp directories left behind by workers that died mid-job"""
+    if not os.path.isdir(JOB_TEMP_ROOT):
+        return 0
+    cutoff = (now or time.time()) - ARTIFACT_TTLS['intermediate']
+    removed = 0
+    for entry in os.scandir(JOB_TEMP_ROOT):
+        try:
+            if entry.name.startswith("job_") and entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        except OSError as e:
+            logger.error(f"Error removing temp directory {entry.path}: {str(e)}")
+    if removed:
+        logger.info(f"Janitor removed {removed} stale job temp directories")
+    return removed
+
+def _janitor_loop(app):
+    while True:
+        try:
+            with app.app_context():
+                purge_expired()
+        except Exception as e:
+            logger.error(f"Janitor error: {str(e)}")
+        try:
+            purge_stale_temp_dirs()
+        except Exception as e:
+            logger.error(f"Janitor error: {str(e)}")
+        time.sleep(JANITOR_INTERVAL)
+
+def start_janitor(app):
+    """Start the background thread deleting expired artifacts and stale temp directories"""
+    thread = threading.Thread(target=_janitor_loop, args=(app,), name="artifact-janitor", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class BackendError(Exception):
+    """Raised when a transcription/generation backend call fails"""
+
+class ContentBackend:
+    """Interface for transcription and content generation backends"""
+    name = None
+
+    def transcribe(self, file_path):
+        """Return the transcription text of an audio file"""
+        raise NotImplementedError
+
+    def generate(self, system_content, user_content, temperature=0.7, max_tokens=1500):
+        """Return the raw completion text for the given system/user messages"""
+        raise NotImplementedError
+
+class OpenAIBackend(ContentBackend):
+    """Backend calling the OpenAI Whisper and chat completion APIs"""
+    name = "openai"
+
+    def __init__(self, api_key=None, transcription_model="whisper-1", chat_model="gpt-4"):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key or os.environ.get("OPENAI_API_KEY"))
+        self.transcription_model = transcription_model
+        self.chat_model = chat_model
+
+    def transcribe(self, file_path):
+        with open(file_path, "rb") as audio_file:
+            return self.client.audio.transcriptions.create(
+                file=audio_file,
+                model=self.transcription_model,
+                response_format="text"
+            )
+
+    def generate(self, system_content, user_content, temperature=0.7, max_tokens=1500):
+        response = self.client.chat.completions.create(
+            model=self.chat_model,
+            messages=[
+                {"role": "system", "content": system_content},
+                {"role": "user", "content": user_content}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content.strip()
+
+class LocalBackend(ContentBackend):
+    """
+    Offline deterministic stand-in for load and soak testing.
+
+    Output depends only on the input (file content or prompt), so repeated
+    runs are comparable. `latency` seconds are slept on every call and a
+    fraction `error_rate` of calls raise BackendError.
+    """
+    name = "local"
+
+    WORDS = (
+        "security", "network", "exploit", "privacy", "code", "system", "access",
+        "freedom", "data", "firewall", "encryption", "terminal", "breach", "signal",
+        "anonymous", "protocol", "leak", "patch", "payload", "audit"
+    )
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0):
+        self.latency = float(latency)
+        self.error_rate = float(error_rate)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _simulate_call(self, operation):
+        if self.latency > 0:
+            time.sleep(self.latency)
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise BackendError(f"Injected {operation} failure")
+
+    def _words(self, digest, count):
+        return [self.WORDS[digest[i % len(digest)] % len(self.WORDS)] for i in range(count)]
+
+    def transcribe(self, file_path):
+        self._simulate_call("transcription")
+        hasher = hashlib.sha256()
+        with open(file_path, "rb") as audio_file:
+            hasher.update(audio_file.read(1024 * 1024))
+        hasher.update(str(os.path.getsize(file_path)).encode())
+        digest = hasher.digest()
+        sentences = []
+        for start in range(0, 24, 6):
+            words = self._words(digest[start:], 6)
+            sentences.append(" ".join(words).capitalize() + ".")
+        return " ".join(sentences)
+
+    def generate(self, system_content, user_content, temperature=0.7, max_tokens=1500):
+        self._simulate_call("generation")
+        digest = hashlib.sha256((system_content + user_content).encode("utf-8")).digest()
+        words = self._words(digest, 12)
+        return json.dumps({
+            "title": " ".join(words[:4]).title(),
+            "description": " ".join(words).capitalize() + ".",
+            "hashtags": [f"#{word}" for word in words[:5]],
+            "target_audience": "Tech-savvy viewers",
+            "hooks": [f"What nobody tells you about {words[0]}", f"The truth about {words[1]}"],
+            "content_structure": "Hook → Context → Main Content → CTA",
+            "viral_triggers": words[2:5],
+            "platform_specific_tips": "Post consistently",
+            "optimal_posting_times": ["9 AM", "7 PM"],
+            "engagement_strategies": ["Ask a question", "Pin a comment"],
+            "visual_elements": words[5:8],
+            "audio_recommendations": "Dark synth background",
+            "emotional_triggers": ["curiosity"],
+            "pacing_guide": "Fast cuts every 2 seconds",
+            "effect_recommendations": words[8:10],
+            "viral_potential_score": digest[0] % 10 + 1,
+            "improvement_suggestions": ["Shorten the intro"]
+        })
+
+BACKENDS = {
+    OpenAIBackend.name: OpenAIBackend,
+    LocalBackend.name: LocalBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def create_backend(name=None):
+    """Create a backend from its name and environment configuration"""
+    name = (name or os.environ.get("CONTENT_BACKEND", "openai")).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown content backend: {name}")
+    if name == LocalBackend.name:
+        return LocalBackend(
+            latency=os.environ.get("LOCAL_BACKEND_LATENCY", 0),
+            error_rate=os.environ.get("LOCAL_BACKEND_ERROR_RATE", 0),
+            seed=int(os.environ.get("LOCAL_BACKEND_SEED", 0))
+        )
+    return BACKENDS[name]()
+
+def get_backend():
+    """Return the process-wide backend selected by CONTENT_BACKEND"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend()
+                logger.info(f"Using content backend: {_backend.name}")
+    return _backend
+
+def set_backend(backend):
+    """Replace the process-wide backend (benchmarks, load tests)"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
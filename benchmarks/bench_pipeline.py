@@ -0,0 +1,273 @@
+"""
+Benchmark suite for the media functions and the /upload route.
+
+Synthetic MP3/MP4 fixtures are generated once per duration/resolution and
+cached in benchmarks/.fixtures. Every case runs in a fresh process so that
+peak RSS is per case; CPU time includes ffmpeg child processes. The /upload
+case uses the local content backend, so no OpenAI calls are made.
+
+Usage:
+    python benchmarks/bench_pipeline.py                 # run and compare with baseline
+    python benchmarks/bench_pipeline.py --save-baseline # record a new baseline
+    python benchmarks/bench_pipeline.py --quick -k overlay
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import statistics
+import queue as queue_module
+import multiprocessing
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+FIXTURES_DIR = os.path.join(BENCH_DIR, ".fixtures")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+DURATIONS = (5, 15, 30)
+RESOLUTIONS = {
+    "480p": (480, 854),
+    "720p": (720, 1280),
+}
+METRICS = ("wall_s", "cpu_s", "peak_rss_mb")
+DEFAULT_CASE_TIMEOUT = 1800
+
+def fixture_path(kind, duration, resolution=None):
+    name = f"{kind}_{duration}s" + (f"_{resolution}" if resolution else "")
+    return os.path.join(FIXTURES_DIR, name + (".mp4" if kind == "video" else ".mp3"))
+
+def _tone(duration):
+    import numpy as np
+    from moviepy.editor import AudioClip
+
+    def make_frame(t):
+        wave = 0.3 * np.sin(2 * np.pi * 440 * t) + 0.1 * np.sin(2 * np.pi * 97 * t)
+        return np.array([wave, wave]).T
+    return AudioClip(make_frame, duration=duration, fps=44100)
+
+def make_audio_fixture(duration):
+    path = fixture_path("audio", duration)
+    if not os.path.exists(path):
+        _tone(duration).write_audiofile(path, fps=44100, codec="libmp3lame", bitrate="128k", logger=None)
+    return path
+
+def make_video_fixture(duration, resolution):
+    path = fixture_path("video", duration, resolution)
+    if os.path.exists(path):
+        return path
+    import numpy as np
+    from moviepy.editor import VideoClip
+
+    width, height = RESOLUTIONS[resolution]
+    gradient = np.tile(np.linspace(0, 255, width, dtype=np.uint8), (height, 1))
+
+    def make_frame(t):
+        # A moving gradient keeps the encoder busy unlike a flat color clip
+        shifted = np.roll(gradient, int(t * 60), axis=1)
+        return np.dstack([shifted, np.flipud(shifted), np.full_like(shifted, int(t * 8) % 255)])
+
+    clip = VideoClip(make_frame, duration=duration).set_audio(_tone(duration))
+    clip.write_videofile(path, fps=24, codec="libx264", audio_codec="aac", preset="ultrafast", logger=None)
+    clip.close()
+    return path
+
+def build_cases(durations, resolutions):
+    cases = []
+    for duration in durations:
+        cases.append({"name": f"process_audio:{duration}s", "kind": "process_audio",
+                      "audio": fixture_path("audio", duration)})
+        for resolution in resolutions:
+            video = fixture_path("video", duration, resolution)
+            audio = fixture_path("audio", duration)
+            suffix = f"{resolution}:{duration}s"
+            cases.extend([
+                {"name": f"extract_audio_from_video:{suffix}", "kind": "extract_audio_from_video", "video": video},
+                {"name": f"add_text_overlay:{suffix}", "kind": "add_text_overlay", "video": video},
+                {"name": f"combine_audio_with_video:{suffix}", "kind": "combine_audio_with_video",
+                 "video": video, "audio": audio},
+                {"name": f"upload:{suffix}", "kind": "upload", "video": video, "audio": audio},
+            ])
+    return cases
+
+def _prepare(case, work_dir):
+    """Import and stage everything outside the timed region; return the timed callable"""
+    kind = case["kind"]
+    if kind == "upload":
+        os.environ["CONTENT_BACKEND"] = "local"
+        os.environ["VIRAL_DATABASE_URI"] = "sqlite:///" + os.path.join(work_dir, "bench.db")
+        os.chdir(ROOT_DIR)
+        from app import app, init_app_state
+        import routes  # noqa: F401  registers the /upload route
+        app.config["UPLOAD_FOLDER"] = work_dir
+        # Schema setup and the janitor otherwise run on the first (timed) request
+        init_app_state()
+        client = app.test_client()
+
+        def run():
+            with open(case["video"], "rb") as video, open(case["audio"], "rb") as audio:
+                response = client.post("/upload", data={
+                    "theme": "cyber",
+                    "files[]": [(video, "bench.mp4"), (audio, "bench.mp3")],
+                }, content_type="multipart/form-data")
+            if response.status_code != 200:
+                raise RuntimeError(f"/upload returned {response.status_code}: {response.get_data(as_text=True)}")
+        return run
+
+    os.chdir(work_dir)
+    import media_utils
+    for key in ("video", "audio"):
+        if key in case:
+            staged = os.path.join(work_dir, os.path.basename(case[key]))
+            shutil.copyfile(case[key], staged)
+            case[key] = staged
+
+    if kind == "process_audio":
+        return lambda: media_utils.process_audio(case["audio"], theme="cyber")
+    if kind == "extract_audio_from_video":
+        return lambda: media_utils.extract_audio_from_video(case["video"], os.path.join(work_dir, "out.mp3"))
+    if kind == "add_text_overlay":
+        return lambda: media_utils.add_text_overlay(case["video"], "Benchmark title\nHook line", theme="cyber")
+    if kind == "combine_audio_with_video":
+        return lambda: media_utils.combine_audio_with_video(case["video"], case["audio"])
+    raise ValueError(f"Unknown benchmark kind: {kind}")
+
+def _cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+def _run_case(case, queue):
+    work_dir = tempfile.mkdtemp(prefix="viral-bench-")
+    try:
+        run = _prepare(case, work_dir)
+        cpu_start = _cpu_seconds()
+        wall_start = time.perf_counter()
+        run()
+        wall = time.perf_counter() - wall_start
+        cpu = _cpu_seconds() - cpu_start
+        # ru_maxrss is in KiB on Linux; ffmpeg children are reported separately
+        peak_kib = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                       resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+        queue.put({"wall_s": wall, "cpu_s": cpu, "peak_rss_mb": peak_kib / 1024})
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def _wait_for_result(process, queue, timeout):
+    """Wait for the child's result, reporting a crash or timeout as an error"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return queue.get(timeout=1)
+        except queue_module.Empty:
+            pass
+        if not process.is_alive():
+            # The result may have been posted right before the process exited
+            try:
+                return queue.get(timeout=1)
+            except queue_module.Empty:
+                return {"error": f"worker exited with code {process.exitcode} without a result"}
+        if time.monotonic() > deadline:
+            process.kill()
+            return {"error": f"timed out after {timeout:.0f}s"}
+
+def run_case(case, repeat, timeout=DEFAULT_CASE_TIMEOUT):
+    """Run a case `repeat` times in fresh processes and keep the median of each metric"""
+    context = multiprocessing.get_context("spawn")
+    samples = []
+    for _ in range(repeat):
+        queue = context.Queue()
+        process = context.Process(target=_run_case, args=(dict(case), queue))
+        process.start()
+        result = _wait_for_result(process, queue, timeout)
+        process.join()
+        if "error" in result:
+            return result
+        samples.append(result)
+    return {metric: round(statistics.median(s[metric] for s in samples), 3) for metric in METRICS}
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages against the stored baseline"""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference or "error" in result:
+            continue
+        for metric in METRICS:
+            if metric in reference and result[metric] > reference[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{name} {metric}: {result[metric]:.3f} vs baseline {reference[metric]:.3f}"
+                )
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="pattern", help="only run cases whose name contains this string")
+    parser.add_argument("--quick", action="store_true", help="shortest duration and lowest resolution only")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case (median is kept)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown ratio before failing")
+    parser.add_argument("--output", help="also write results to this JSON file")
+    parser.add_argument("--case-timeout", type=float, default=DEFAULT_CASE_TIMEOUT,
+                        help="seconds before a single run of a case is killed")
+    args = parser.parse_args(argv)
+
+    durations = DURATIONS[:1] if args.quick else DURATIONS
+    resolutions = list(RESOLUTIONS)[:1] if args.quick else list(RESOLUTIONS)
+
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for duration in durations:
+        make_audio_fixture(duration)
+        for resolution in resolutions:
+            make_video_fixture(duration, resolution)
+
+    cases = [c for c in build_cases(durations, resolutions) if not args.pattern or args.pattern in c["name"]]
+    results = {}
+    print(f"{'case':<45} {'wall_s':>9} {'cpu_s':>9} {'peak_rss_mb':>12}")
+    for case in cases:
+        result = run_case(case, args.repeat, args.case_timeout)
+        results[case["name"]] = result
+        if "error" in result:
+            print(f"{case['name']:<45} ERROR {result['error']}")
+        else:
+            print(f"{case['name']:<45} {result['wall_s']:>9.3f} {result['cpu_s']:>9.3f} {result['peak_rss_mb']:>12.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    failed = sorted(name for name, result in results.items() if "error" in result)
+    if failed:
+        print(f"FAILED {len(failed)}/{len(results)} cases: {', '.join(failed)}")
+
+    if args.save_baseline:
+        if failed:
+            print("Baseline not written because some cases failed")
+            return 1
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found; run with --save-baseline to record one")
+        return 1 if failed else 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    return 1 if regressions or failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
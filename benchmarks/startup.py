@@ -0,0 +1,66 @@
+"""
+Startup-time budget check for the web process.
+
+Imports `main` (the app plus all routes) in a fresh interpreter and fails if
+the import takes longer than the budget or pulls in the media/API stack,
+which must only load on first use.
+
+Usage:
+    python benchmarks/startup.py [--budget 1.0] [--repeat 5]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+# Modules that are only needed once a file is processed
+HEAVY_MODULES = ("moviepy", "numpy", "imageio", "pydub", "openai")
+
+PROBE = """
+import sys, json, time, resource
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "import_s": elapsed,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "loaded": sorted({name.split(".")[0] for name in sys.modules} & set(%r)),
+}))
+""" % (HEAVY_MODULES,)
+
+def measure():
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=ROOT_DIR, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=float(os.environ.get("STARTUP_BUDGET", 1.0)),
+                        help="maximum median import time in seconds")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    samples = [measure() for _ in range(args.repeat)]
+    import_s = statistics.median(s["import_s"] for s in samples)
+    rss_mb = statistics.median(s["rss_mb"] for s in samples)
+    loaded = sorted({name for s in samples for name in s["loaded"]})
+
+    print(f"import main: {import_s:.3f}s (budget {args.budget:.3f}s), peak RSS {rss_mb:.1f} MB")
+    failed = False
+    if import_s > args.budget:
+        print("FAIL: startup exceeds budget")
+        failed = True
+    if loaded:
+        print(f"FAIL: heavy modules loaded at startup: {', '.join(loaded)}")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from contextlib import contextmanager
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; reservations are then per process only
+    fcntl = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Reservations are shared by all worker processes through a locked ledger file
+LEDGER_PATH = os.environ.get("DISK_LEDGER_PATH", os.path.join("instance", "disk_reservations.json"))
+SAFETY_MARGIN = int(os.environ.get("DISK_SAFETY_MARGIN_BYTES", 256 * 1024 * 1024))
+RESERVATION_TIMEOUT = float(os.environ.get("DISK_RESERVATION_TIMEOUT", 600))
+STALE_RESERVATION_AGE = float(os.environ.get("DISK_STALE_RESERVATION_SECONDS", 2 * 3600))
+# Container overhead and bitrate overshoot on top of the nominal size
+ESTIMATE_OVERHEAD = 1.15
+
+_UNITS = {'k': 1e3, 'm': 1e6, 'g': 1e9}
+_process_lock = threading.Lock()
+
+QUEUE_DEPTH = metrics.REGISTRY.register(metrics.Gauge(
+    "viral_disk_reservation_queue_depth", "Jobs waiting for disk space"))
+RESERVED_BYTES = metrics.REGISTRY.register(metrics.Gauge(
+    "viral_disk_reserved_bytes", "Disk space reserved by this process"))
+WAIT_SECONDS = metrics.REGISTRY.register(metrics.Histogram(
+    "viral_disk_reservation_wait_seconds", "Time spent waiting for a disk reservation"))
+
+class InsufficientDiskSpace(Exception):
+    """Raised when a reservation cannot be satisfied in time"""
+
+def parse_bitrate(value):
+    """Convert an ffmpeg bitrate string such as '128k' or '20M' to bits per second"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = value.strip().lower()
+    if value and value[-1] in _UNITS:
+        return float(value[:-1]) * _UNITS[value[-1]]
+    return float(value)
+
+def estimate_bytes(duration, *bitrates):
+    """Estimate the size of a stream of `duration` seconds encoded at the given bitrates"""
+    bits_per_second = sum(parse_bitrate(b) for b in bitrates if b)
+    return int((duration or 0) * bits_per_second / 8 * ESTIMATE_OVERHEAD)
+
+@contextmanager
+def _ledger():
+    """Yield the reservation ledger while holding the cross-process lock"""
+    os.makedirs(os.path.dirname(LEDGER_PATH) or ".", exist_ok=True)
+    with _process_lock, open(LEDGER_PATH, "a+") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            content = f.read()
+            try:
+                ledger = json.loads(content) if content else {}
+            except ValueError:
+                logger.error("Disk reservation ledger is corrupt, resetting it")
+                ledger = {}
+            yield ledger
+            f.seek(0)
+            f.truncate()
+            json.dump(ledger, f)
+            f.flush()
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _prune(ledger, now):
+    """Drop reservations left behind by dead processes or crashed jobs"""
+    for key, entry in list(ledger.items()):
+        if not _pid_alive(entry["pid"]) or now - entry["created"] > STALE_RESERVATION_AGE:
+            del ledger[key]
+
+def _free_bytes(directory):
+    st = os.statvfs(directory)
+    return st.f_bavail * st.f_frsize
+
+def _unwritten(entry):
+    """Part of a reservation not yet on disk (what is written is already out of statvfs)"""
+    path = entry.get("path")
+    try:
+        written = os.path.getsize(path) if path else 0
+    except OSError:
+        written = 0
+    return max(entry["bytes"] - written, 0)
+
+@contextmanager
+def reserve(size, path, timeout=None):
+    """
+    Reserve `size` bytes on the volume holding `path` until the block exits.
+
+    Waits while other jobs' unwritten reservations hold the space and raises
+    InsufficientDiskSpace if it cannot be reserved within `timeout` seconds.
+    Fails at once when the request exceeds the free space itself, since
+    finished jobs release their reservation but keep their output on disk.
+    """
+    path = os.path.abspath(path)
+    directory = os.path.dirname(path)
+    timeout = RESERVATION_TIMEOUT if timeout is None else timeout
+    if not hasattr(os, "statvfs"):
+        # Free space can't be measured here; behave like the old check
+        yield
+        return
+
+    device = os.stat(directory).st_dev
+    key = uuid.uuid4().hex
+    start = time.monotonic()
+    delay = 0.25
+    queued = False
+    try:
+        while True:
+            with _ledger() as ledger:
+                now = time.time()
+                _prune(ledger, now)
+                usable = _free_bytes(directory) - SAFETY_MARGIN
+                if size > usable:
+                    # Waiting for other jobs cannot free more than this
+                    raise InsufficientDiskSpace(
+                        f"Insufficient disk space for processing: need {size} bytes, {max(usable, 0)} available"
+                    )
+                reserved = sum(_unwritten(e) for e in ledger.values() if e["device"] == device)
+                if usable - reserved >= size:
+                    ledger[key] = {"pid": os.getpid(), "bytes": size, "device": device,
+                                   "path": path, "created": now}
+                    break
+            if time.monotonic() - start > timeout:
+                raise InsufficientDiskSpace(f"Timed out waiting for {size} bytes of disk space")
+            if not queued:
+                queued = True
+                QUEUE_DEPTH.inc()
+                logger.info(f"Waiting for {size} bytes of disk space ({reserved} reserved by other jobs)")
+            time.sleep(delay)
+            delay = min(delay * 2, 5)
+    finally:
+        if queued:
+            QUEUE_DEPTH.dec()
+    WAIT_SECONDS.observe(time.monotonic() - start)
+
+    RESERVED_BYTES.inc(size)
+    try:
+        yield
+    finally:
+        RESERVED_BYTES.dec(size)
+        with _ledger() as ledger:
+            ledger.pop(key, None)
@@ -1,38 +1,33 @@
 import os
-from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip, AudioFileClip, ColorClip, vfx
-from pydub import AudioSegment
-from pydub.effects import normalize, compress_dynamic_range
 import logging
 import time
+from contextlib import contextmanager
 from werkzeug.utils import secure_filename
+from metrics import instrumented
+import profiling
+import artifacts
+import diskspace
+
+# MoviePy and pydub (and the numpy/imageio stack behind them) are imported
+# inside the functions that need them so web workers don't pay for them at boot
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def check_disk_space(file_size):
-    """Check if there's enough disk space for processing"""
-    try:
-        st = os.statvfs('/')
-        free_space = st.f_bavail * st.f_frsize
-        # Require 3x the file size for processing
-        return free_space > (file_size * 3)
-    except:
-        # Default to True on systems where statvfs is not available
-        return True
+def temp_audiofile(output_path):
+    """MoviePy's temporary audio track for output_path, kept in the job's temp directory"""
+    name = os.path.basename(output_path) + 'TEMP_MPY_wvf_snd.m4a'
+    # Outside a job this is MoviePy's own default, in the working directory
+    return artifacts.temp_path(name) or name
 
-def cleanup_temp_files():
-    """Clean up temporary files created during processing"""
-    temp_pattern = "*TEMP_MPY*"
-    try:
-        import glob
-        for temp_file in glob.glob(temp_pattern):
-            try:
-                os.remove(temp_file)
-            except OSError:
-                pass
-    except Exception as e:
-        logger.error(f"Error cleaning up temp files: {str(e)}")
+@contextmanager
+def reserve_video_output(duration, settings, output_path, temp_audio_path):
+    """Reserve space for a video encode and its temp audio track, each on its own volume"""
+    with diskspace.reserve(diskspace.estimate_bytes(duration, settings['bitrate'], settings['audio_bitrate']),
+                           output_path), \
+         diskspace.reserve(diskspace.estimate_bytes(duration, settings['audio_bitrate']), temp_audio_path):
+        yield
 
 def optimize_video_settings(clip, target_size_mb=20):
     """Optimize video settings to reduce file size"""
@@ -46,42 +41,43 @@ def optimize_video_settings(clip, target_size_mb=20):
         'threads': 2
     }
 
+@instrumented('extract_audio', encode=True)
 def extract_audio_from_video(video_path, output_path=None):
     """Extract audio from a video file with optimization"""
+    from moviepy.editor import VideoFileClip
     try:
         if not output_path:
             output_path = os.path.splitext(video_path)[0] + '.mp3'
             
-        if not check_disk_space(os.path.getsize(video_path)):
-            raise Exception("Insufficient disk space for processing")
-            
         video = VideoFileClip(video_path)
         if video.audio is not None:
-            video.audio.write_audiofile(output_path, 
-                                    bitrate="128k",
-                                    fps=44100,
-                                    nbytes=2,
-                                    codec='libmp3lame')
+            artifacts.register(output_path, 'intermediate')
+            with diskspace.reserve(diskspace.estimate_bytes(video.duration, "128k"), output_path):
+                try:
+                    video.audio.write_audiofile(output_path, 
+                                            bitrate="128k",
+                                            fps=44100,
+                                            nbytes=2,
+                                            codec='libmp3lame',
+                                            **profiling.ffmpeg_options())
+                finally:
+                    profiling.collect_ffmpeg_log('extract_audio', output_path)
             
         video.close()
-        cleanup_temp_files()
         
         return output_path
     except Exception as e:
-        cleanup_temp_files()
         logger.error(f"Error extracting audio from video: {str(e)}")
         raise
 
+@instrumented('combine', encode=True)
 def combine_audio_with_video(video_path, audio_path, output_path=None):
     """Combine audio with video with optimization"""
+    from moviepy.editor import VideoFileClip, AudioFileClip
     try:
         if not output_path:
             output_path = os.path.splitext(video_path)[0] + '_combined.mp4'
             
-        total_size = os.path.getsize(video_path) + os.path.getsize(audio_path)
-        if not check_disk_space(total_size):
-            raise Exception("Insufficient disk space for processing")
-            
         video = VideoFileClip(video_path)
         audio = AudioFileClip(audio_path)
         
@@ -89,16 +85,23 @@ def combine_audio_with_video(video_path, audio_path, output_path=None):
             audio = audio.subclip(0, video.duration)
         
         final_video = video.set_audio(audio)
-        final_video.write_videofile(output_path, **optimize_video_settings(final_video))
+        encode_settings = optimize_video_settings(final_video)
+        artifacts.register(output_path, 'intermediate')
+        temp_audio = temp_audiofile(output_path)
+        with reserve_video_output(final_video.duration, encode_settings, output_path, temp_audio):
+            try:
+                final_video.write_videofile(output_path, **encode_settings,
+                                            temp_audiofile=temp_audio,
+                                            **profiling.ffmpeg_options())
+            finally:
+                profiling.collect_ffmpeg_log('combine', output_path)
         
         video.close()
         audio.close()
         final_video.close()
-        cleanup_temp_files()
         
         return output_path
     except Exception as e:
-        cleanup_temp_files()
         logger.error(f"Error combining audio with video: {str(e)}")
         raise
 
@@ -123,14 +126,14 @@ def get_effect_intensity_settings(intensity='medium'):
     }
     return intensity_settings.get(intensity, intensity_settings['medium'])
 
+@instrumented('process_audio', encode=True)
 def process_audio(audio_path, theme='anonymous', intensity='medium', output_path=None):
     """Process audio with optimization and intensity settings"""
+    from pydub import AudioSegment
+    from pydub.effects import normalize, compress_dynamic_range
     try:
         if not output_path:
             output_path = os.path.splitext(audio_path)[0] + '_processed.mp3'
-            
-        if not check_disk_space(os.path.getsize(audio_path)):
-            raise Exception("Insufficient disk space for processing")
         
         logger.info(f"Processing audio with theme: {theme}, intensity: {intensity}")
         
@@ -156,28 +159,27 @@ def process_audio(audio_path, theme='anonymous', intensity='medium', output_path
             audio = compress_dynamic_range(audio, ratio=settings['compression_ratio'])
             
         # Export with optimized settings
-        audio.export(output_path, 
-                    format='mp3',
-                    bitrate='128k',
-                    parameters=["-q:a", "4"])
+        artifacts.register(output_path, 'output')
+        with diskspace.reserve(diskspace.estimate_bytes(audio.duration_seconds, '128k'), output_path):
+            audio.export(output_path, 
+                        format='mp3',
+                        bitrate='128k',
+                        parameters=["-q:a", "4"])
         
-        cleanup_temp_files()
         logger.info(f"Audio processing completed: {output_path}")
         return output_path
     except Exception as e:
-        cleanup_temp_files()
         logger.error(f"Error processing audio: {str(e)}")
         raise
 
+@instrumented('text_overlay', encode=True)
 def add_text_overlay(video_path, text, position='bottom', output_path=None, theme='anonymous', intensity='medium'):
     """Add text overlay to video with optimization and intensity settings"""
+    from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip
     try:
         if not output_path:
             output_path = os.path.splitext(video_path)[0] + '_with_text.mp4'
             
-        if not check_disk_space(os.path.getsize(video_path)):
-            raise Exception("Insufficient disk space for processing")
-            
         logger.info(f"Adding text overlay with theme: {theme}, intensity: {intensity}")
         
         # Get effect settings
@@ -230,16 +232,23 @@ def add_text_overlay(video_path, text, position='bottom', output_path=None, them
         
         # Combine video with text
         final_video = CompositeVideoClip([video, text_clip])
-        final_video.write_videofile(output_path, **optimize_video_settings(final_video))
+        encode_settings = optimize_video_settings(final_video)
+        artifacts.register(output_path, 'output')
+        temp_audio = temp_audiofile(output_path)
+        with reserve_video_output(final_video.duration, encode_settings, output_path, temp_audio):
+            try:
+                final_video.write_videofile(output_path, **encode_settings,
+                                            temp_audiofile=temp_audio,
+                                            **profiling.ffmpeg_options())
+            finally:
+                profiling.collect_ffmpeg_log('text_overlay', output_path)
         
         video.close()
         text_clip.close()
         final_video.close()
-        cleanup_temp_files()
         
         logger.info(f"Video processing completed: {output_path}")
         return output_path
     except Exception as e:
-        cleanup_temp_files()
         logger.error(f"Error adding text overlay: {str(e)}")
         raise
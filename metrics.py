@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import uuid
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Emit one structured JSON line per traced request when enabled
+TRACE_LOG = os.environ.get("TRACE_LOG", "").lower() in ("1", "true", "yes")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels
+    )
+    return "{" + pairs + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Metric:
+    """Base class for labelled metrics kept in process memory"""
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """Yield (suffix, labels, value) tuples"""
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield "", key, value
+
+class Gauge(Metric):
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_in_progress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield "", key, value
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][index] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, dict(state, counts=list(state["counts"]))) for key, state in self._values.items()]
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["counts"]):
+                cumulative += count
+                yield "_bucket", key + (("le", _format_value(bound)),), cumulative
+            yield "_sum", key, state["sum"]
+            yield "_count", key, state["count"]
+
+class Registry:
+    """Collection of metrics plus callbacks producing extra metrics at scrape time"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Duplicate metric: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def register_collector(self, collector):
+        """Register a callable returning metrics to render on every scrape"""
+        with self._lock:
+            self._collectors.append(collector)
+        return collector
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            try:
+                for metric in collector():
+                    lines.extend(metric.render())
+            except Exception as e:
+                logger.error(f"Error collecting metrics: {str(e)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "viral_stage_duration_seconds", "Time spent in each pipeline stage", ("stage",)))
+STAGE_ERRORS = REGISTRY.register(Counter(
+    "viral_stage_errors_total", "Pipeline stage failures", ("stage",)))
+STAGE_BYTES_IN = REGISTRY.register(Counter(
+    "viral_stage_bytes_in_total", "Bytes read by pipeline stages", ("stage",)))
+STAGE_BYTES_OUT = REGISTRY.register(Counter(
+    "viral_stage_bytes_out_total", "Bytes written by pipeline stages", ("stage",)))
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    "viral_request_duration_seconds", "End-to-end request latency", ("endpoint",)))
+REQUESTS = REGISTRY.register(Counter(
+    "viral_requests_total", "Requests handled", ("endpoint", "status")))
+REQUESTS_IN_PROGRESS = REGISTRY.register(Gauge(
+    "viral_requests_in_progress", "Requests currently being processed", ("endpoint",)))
+ENCODES_IN_FLIGHT = REGISTRY.register(Gauge(
+    "viral_encodes_in_flight", "Media encodes currently running", ("stage",)))
+
+_current_trace = contextvars.ContextVar("viral_trace", default=None)
+
+def _file_size(value):
+    if isinstance(value, str) and os.path.isfile(value):
+        return os.path.getsize(value)
+    return 0
+
+@contextmanager
+def stage(name, bytes_in=0):
+    """Time a pipeline stage and add it to the current request trace"""
+    trace = _current_trace.get()
+    start = time.perf_counter()
+    ok = True
+    if bytes_in:
+        STAGE_BYTES_IN.inc(bytes_in, stage=name)
+    try:
+        yield
+    except Exception:
+        ok = False
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_DURATION.observe(duration, stage=name)
+        if trace is not None:
+            trace["stages"].append({"stage": name, "duration_s": round(duration, 4), "ok": ok})
+
+def instrumented(name, encode=False):
+    """
+    Decorator recording duration and bytes for a media function.
+
+    Path arguments count as bytes in, the returned path as bytes out.
+    `encode=True` also tracks the call in the in-flight encodes gauge.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bytes_in = sum(_file_size(arg) for arg in args)
+            with stage(name, bytes_in=bytes_in):
+                if encode:
+                    with ENCODES_IN_FLIGHT.track_in_progress(stage=name):
+                        result = func(*args, **kwargs)
+                else:
+                    result = func(*args, **kwargs)
+            bytes_out = _file_size(result)
+            if bytes_out:
+                STAGE_BYTES_OUT.inc(bytes_out, stage=name)
+            return result
+        return wrapper
+    return decorator
+
+def current_trace():
+    """Return the trace dict of the request being processed, if any"""
+    return _current_trace.get()
+
+def track_request(endpoint):
+    """View decorator recording request latency/status and the per-request trace"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import make_response
+            trace = {"request_id": uuid.uuid4().hex, "endpoint": endpoint, "stages": []}
+            token = _current_trace.set(trace)
+            start = time.perf_counter()
+            status = 500
+            try:
+                with REQUESTS_IN_PROGRESS.track_in_progress(endpoint=endpoint):
+                    response = make_response(view(*args, **kwargs))
+                status = response.status_code
+                return response
+            finally:
+                duration = time.perf_counter() - start
+                REQUEST_DURATION.observe(duration, endpoint=endpoint)
+                REQUESTS.inc(endpoint=endpoint, status=str(status))
+                _current_trace.reset(token)
+                if TRACE_LOG:
+                    trace.update(status=status, duration_s=round(duration, 4))
+                    logger.info(json.dumps(trace))
+        return wrapper
+    return decorator
+
+def render():
+    """Render all metrics in the Prometheus text exposition format"""
+    return REGISTRY.render()
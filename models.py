@@ -1,12 +1,150 @@
+import hashlib
 from datetime import datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from app import db
 
+class Generation(db.Model):
+    """Generated content shared by every Content row of an upload batch"""
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False, unique=True)  # sha256 of content
+    theme = db.Column(db.String(50), nullable=False, index=True)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
 class Content(db.Model):
+    __table_args__ = (
+        # Keyset pagination of the history orders by (created_at, id),
+        # optionally filtered by theme
+        db.Index('ix_content_created_at_id', 'created_at', 'id'),
+        db.Index('ix_content_theme_created_at_id', 'theme', 'created_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     original_filename = db.Column(db.String(255), nullable=False)
     stored_filename = db.Column(db.String(255), nullable=False)
     file_type = db.Column(db.String(10), nullable=False)
     theme = db.Column(db.String(50), nullable=False)
-    generated_content = db.Column(db.Text)
+    legacy_generated_content = db.Column('generated_content', db.Text)  # rows saved before Generation existed
+    generation_id = db.Column(db.Integer, db.ForeignKey('generation.id'), index=True)
+    profile_id = db.Column(db.Integer, db.ForeignKey('profile.id'), index=True)  # set when the upload was profiled
     processed_filename = db.Column(db.String(255))  # Add this line
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    generation = db.relationship('Generation', lazy='select')
+
+    @property
+    def generated_content(self):
+        if self.generation_id is not None:
+            return self.generation.content
+        return self.legacy_generated_content
+
+class Profile(db.Model):
+    """One profiled request; its Content rows point here through Content.profile_id"""
+    id = db.Column(db.Integer, primary_key=True)
+    request_id = db.Column(db.String(32), nullable=False, unique=True)
+    filename = db.Column(db.String(255), nullable=False)
+    wall_time = db.Column(db.Float)
+    ffmpeg_stats = db.Column(db.Text)  # JSON list of ffmpeg -benchmark stats per encode
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Artifact(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(512), nullable=False, unique=True)
+    job_id = db.Column(db.String(32), nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)  # upload, intermediate or output
+    size = db.Column(db.BigInteger, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+def content_hash(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def get_or_create_generation(content, theme):
+    """Return the Generation row for this content, storing it once"""
+    digest = content_hash(content)
+    generation = Generation.query.filter_by(content_hash=digest).first()
+    if generation is not None:
+        return generation
+    generation = Generation()
+    generation.content_hash = digest
+    generation.theme = theme
+    generation.content = content
+    db.session.add(generation)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # Stored concurrently by another request; call this before adding
+        # other rows to the session since they are rolled back too
+        db.session.rollback()
+        generation = Generation.query.filter_by(content_hash=digest).one()
+    return generation
+
+# Columns added to Content after its table was first created
+CONTENT_UPGRADE_COLUMNS = {
+    'generation_id': 'INTEGER REFERENCES generation (id)',
+    'profile_id': 'INTEGER REFERENCES profile (id)',
+}
+
+def _content_columns():
+    return {column['name'] for column in inspect(db.engine).get_columns('content')}
+
+def _content_indexes():
+    return {index['name'] for index in inspect(db.engine).get_indexes('content')}
+
+def upgrade_schema():
+    """
+    Add columns and indexes that db.create_all() does not add to existing tables.
+
+    Every worker runs this on its first request, so a concurrent worker may
+    apply the same change first; that error is ignored once the change exists.
+    """
+    for column, definition in CONTENT_UPGRADE_COLUMNS.items():
+        if column in _content_columns():
+            continue
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(text(f'ALTER TABLE content ADD COLUMN {column} {definition}'))
+        except DBAPIError:
+            if column not in _content_columns():
+                raise
+    for index in Content.__table__.indexes:
+        if index.name in _content_indexes():
+            continue
+        try:
+            with db.engine.begin() as connection:
+                index.create(connection)
+        except DBAPIError:
+            if index.name not in _content_indexes():
+                raise
+    # Superseded by ix_content_theme_created_at_id
+    if 'ix_content_theme' in _content_indexes():
+        with db.engine.begin() as connection:
+            connection.execute(text('DROP INDEX IF EXISTS ix_content_theme'))
+
+def backfill_generations(batch_size=500):
+    """Move generated_content of legacy Content rows into Generation, in batches"""
+    moved = 0
+    while True:
+        batch = (Content.query
+                 .filter(Content.generation_id.is_(None), Content.legacy_generated_content.isnot(None))
+                 .order_by(Content.id)
+                 .limit(batch_size)
+                 .all())
+        if not batch:
+            break
+        # Store the batch's generations first, each committed on its own, so a
+        # rollback in get_or_create_generation cannot discard other changes
+        generation_ids = {}
+        for content in batch:
+            digest = content_hash(content.legacy_generated_content)
+            if digest not in generation_ids:
+                generation = get_or_create_generation(content.legacy_generated_content, content.theme)
+                db.session.commit()
+                generation_ids[digest] = generation.id
+        for content in batch:
+            content.generation_id = generation_ids[content_hash(content.legacy_generated_content)]
+            content.legacy_generated_content = None
+        db.session.commit()
+        moved += len(batch)
+    return moved
@@ -0,0 +1,150 @@
+import os
+import re
+import hmac
+import json
+import time
+import cProfile
+import logging
+import functools
+import contextvars
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Profiling is only available when an operator token is configured
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")
+PROFILES_DIR = os.path.join("instance", "profiles")
+
+_BENCH_LINE = re.compile(r"bench:\s+(.*)")
+_BENCH_FIELD = re.compile(r"(\w+)=([\d.]+)(s|kB)?")
+
+_current_session = contextvars.ContextVar("viral_profile", default=None)
+
+class ProfileSession:
+    """cProfile run plus the ffmpeg -benchmark stats gathered for one request"""
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.profiler = cProfile.Profile()
+        self.ffmpeg_stats = []
+        self.content_ids = []
+        self.wall_time = None
+        self._start = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.wall_time = time.perf_counter() - self._start
+
+    @property
+    def filename(self):
+        return f"profile_{self.request_id}.prof"
+
+    def dump(self):
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        path = os.path.join(PROFILES_DIR, self.filename)
+        self.profiler.dump_stats(path)
+        return path
+
+def is_authorized(req):
+    """Check the operator token sent in the X-Profile-Token header"""
+    if not PROFILE_TOKEN:
+        return False
+    token = req.headers.get("X-Profile-Token", "")
+    return hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+def attach(content_entries):
+    """Link the current profile (if any) to the saved Content rows"""
+    session = _current_session.get()
+    if session is not None:
+        session.content_ids.extend(entry.id for entry in content_entries)
+
+def ffmpeg_options():
+    """Extra moviepy write options enabling ffmpeg's -benchmark output when profiling"""
+    if _current_session.get() is None:
+        return {}
+    return {"ffmpeg_params": ["-benchmark"], "write_logfile": True}
+
+def parse_benchmark_log(text):
+    """Parse `bench:` lines from ffmpeg stderr into a dict"""
+    stats = {}
+    for line in text.splitlines():
+        match = _BENCH_LINE.search(line)
+        if not match:
+            continue
+        for name, value, unit in _BENCH_FIELD.findall(match.group(1)):
+            key = f"{name}_{unit.lower()}" if unit else name
+            stats[key] = float(value)
+    return stats
+
+def collect_ffmpeg_log(stage, output_path):
+    """Record the -benchmark stats moviepy logged next to output_path, then remove the log"""
+    session = _current_session.get()
+    log_path = output_path + ".log"
+    if session is None or not os.path.exists(log_path):
+        return
+    try:
+        with open(log_path, errors="replace") as f:
+            stats = parse_benchmark_log(f.read())
+        session.ffmpeg_stats.append({"stage": stage, "output": os.path.basename(output_path), **stats})
+    except OSError as e:
+        logger.error(f"Error reading ffmpeg log {log_path}: {str(e)}")
+    finally:
+        try:
+            os.remove(log_path)
+        except OSError:
+            pass
+
+def _save(session):
+    from app import db
+    from models import Content, Profile
+    import artifacts
+
+    artifacts.track(session.dump(), 'profile', session.request_id)
+    profile = Profile()
+    profile.request_id = session.request_id
+    profile.filename = session.filename
+    profile.wall_time = session.wall_time
+    profile.ffmpeg_stats = json.dumps(session.ffmpeg_stats)
+    db.session.add(profile)
+    db.session.flush()
+    if session.content_ids:
+        (Content.query
+         .filter(Content.id.in_(session.content_ids))
+         .update({Content.profile_id: profile.id}, synchronize_session=False))
+    db.session.commit()
+    logger.info(f"Saved profile {session.filename} ({session.wall_time:.2f}s)")
+
+def profiled(view):
+    """
+    View decorator running the request under cProfile when an operator asks for it.
+
+    The request must carry `X-Profile: 1` and a valid `X-Profile-Token`.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        from flask import request
+        from metrics import current_trace
+        if request.headers.get("X-Profile") != "1" or not is_authorized(request):
+            return view(*args, **kwargs)
+
+        trace = current_trace()
+        session = ProfileSession(trace["request_id"] if trace else os.urandom(16).hex())
+        token = _current_session.set(session)
+        session.start()
+        try:
+            return view(*args, **kwargs)
+        finally:
+            session.stop()
+            _current_session.reset(token)
+            try:
+                _save(session)
+            except Exception as e:
+                from app import db
+                db.session.rollback()
+                logger.error(f"Error saving profile: {str(e)}")
+    return wrapper
@@ -0,0 +1,312 @@
+import os
+import re
+import logging
+from collections import Counter
+from functools import lru_cache
+from types import MappingProxyType
+import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rough budget for the transcription context pasted into the user message.
+# Tokens are estimated from character count (~4 chars per token for GPT models).
+TRANSCRIPT_TOKEN_BUDGET = int(os.environ.get("TRANSCRIPT_TOKEN_BUDGET", 1500))
+CHARS_PER_TOKEN = 4
+
+def _freeze(value):
+    """Recursively convert dicts/lists into read-only mappings/tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def thaw(value):
+    """Return a JSON-serializable copy of a frozen strategy table entry"""
+    if isinstance(value, MappingProxyType):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+LENGTH_GUIDES = _freeze({
+    "short": "30-60 seconds",
+    "medium": "1-3 minutes",
+    "long": "3-5 minutes"
+})
+
+# Enhanced platform-specific optimization guidelines
+PLATFORM_SPECIFICS = _freeze({
+    "tiktok": {
+        "tips": [
+            "Hook viewers in first 3 seconds",
+            "Use trending sounds strategically",
+            "Implement pattern interrupts every 2-3 seconds",
+            "End with strong call-to-action"
+        ],
+        "hashtag_count": 5,
+        "optimal_posting_times": ["9 AM", "12 PM", "7 PM"],
+        "content_structure": "Hook (3s) → Context (7s) → Main Content (20-30s) → CTA (5s)",
+        "engagement_triggers": ["Duets", "Stitch", "Comment-to-unlock", "Use trending sounds"]
+    },
+    "youtube": {
+        "tips": [
+            "Craft compelling thumbnail and title",
+            "Include cards and end screens",
+            "Optimize first 30 seconds for retention",
+            "Use chapters for longer content"
+        ],
+        "hashtag_count": 8,
+        "optimal_posting_times": ["3 PM", "6 PM", "9 PM"],
+        "content_structure": "Hook (15s) → Intro (30s) → Main Content → Summary → CTA",
+        "engagement_triggers": ["Poll cards", "End screens", "Pinned comments", "Community posts"]
+    },
+    "instagram": {
+        "tips": [
+            "Use carousel posts for higher engagement",
+            "Implement visual storytelling",
+            "Include location tags",
+            "Cross-promote with Reels"
+        ],
+        "hashtag_count": 10,
+        "optimal_posting_times": ["11 AM", "2 PM", "7 PM"],
+        "content_structure": "Visual hook → Story progression → Value delivery → CTA",
+        "engagement_triggers": ["Save this post", "Share to stories", "Poll stickers", "Quiz stickers"]
+    }
+})
+
+# Enhanced theme-based content strategies
+THEME_STRATEGIES = _freeze({
+    "anonymous": {
+        "visual_elements": ["Mask imagery", "Dark backgrounds", "Glitch effects"],
+        "storytelling": "Mystery and revelation narrative",
+        "music": "Electronic, bass-heavy background tracks",
+        "effect_intensities": {
+            "low": ["Subtle glitch", "Light distortion"],
+            "medium": ["Moderate glitch", "Voice modulation"],
+            "high": ["Heavy glitch", "Full anonymization"]
+        }
+    },
+    "cyber": {
+        "visual_elements": ["Matrix-style effects", "Code snippets", "Futuristic UI"],
+        "storytelling": "Technical revelation and future implications",
+        "music": "Synthwave or cyberpunk-style background",
+        "effect_intensities": {
+            "low": ["Basic matrix rain", "Simple overlays"],
+            "medium": ["Animated code", "Digital transitions"],
+            "high": ["Full matrix effects", "Complex animations"]
+        }
+    },
+    "hacking": {
+        "visual_elements": ["Terminal interfaces", "Code execution", "System access visuals"],
+        "storytelling": "Problem-solution-impact structure",
+        "music": "Intense, suspenseful background tracks",
+        "effect_intensities": {
+            "low": ["Command line overlay", "Basic typing effect"],
+            "medium": ["Multiple terminals", "Code execution"],
+            "high": ["System breach simulation", "Multiple screens"]
+        }
+    },
+    "hacktivism": {
+        "visual_elements": ["Impact statistics", "Call-to-action graphics", "Movement symbols"],
+        "storytelling": "Cause-effect-solution narrative",
+        "music": "Dramatic, empowering background music",
+        "effect_intensities": {
+            "low": ["Simple overlays", "Basic stats"],
+            "medium": ["Animated stats", "Emphasis effects"],
+            "high": ["Full screen transitions", "Dynamic visualizations"]
+        }
+    }
+})
+
+# Content format strategies
+FORMAT_STRATEGIES = _freeze({
+    "story": {
+        "structure": "Setup → Conflict → Resolution",
+        "duration_distribution": "20% setup, 60% conflict, 20% resolution"
+    },
+    "tutorial": {
+        "structure": "Problem → Solution → Implementation → Results",
+        "duration_distribution": "10% problem, 30% solution, 40% implementation, 20% results"
+    },
+    "review": {
+        "structure": "Introduction → Features → Analysis → Verdict",
+        "duration_distribution": "15% intro, 35% features, 35% analysis, 15% verdict"
+    }
+})
+
+# Emotional impact strategies
+EMOTION_STRATEGIES = _freeze({
+    "neutral": {
+        "tone": "Balanced and informative",
+        "pacing": "Steady and consistent"
+    },
+    "excitement": {
+        "tone": "High energy and dynamic",
+        "pacing": "Fast-paced with quick cuts"
+    },
+    "curiosity": {
+        "tone": "Mysterious and intriguing",
+        "pacing": "Strategic information revelation"
+    },
+    "surprise": {
+        "tone": "Unexpected and dramatic",
+        "pacing": "Build up to reveal moments"
+    }
+})
+
+SYSTEM_PROMPT_SECTIONS = (
+    "\nAnalyze and include:"
+    "\n1. Viral Potential Factors"
+    "\n2. Engagement Optimization"
+    "\n3. Platform-Specific Features"
+    "\n4. Theme Integration"
+    "\n5. Audience Psychology"
+    "\n6. Emotional Triggers"
+    "\n7. Content Structure"
+    "\n8. Visual Effects"
+    "\n9. Audio Elements"
+    "\n10. Call-to-Action Strategy"
+    "\nReturn structured JSON with:"
+    "\n- title"
+    "\n- description"
+    "\n- hashtags (array)"
+    "\n- target_audience"
+    "\n- hooks (array)"
+    "\n- content_structure"
+    "\n- viral_triggers (array)"
+    "\n- platform_specific_tips"
+    "\n- optimal_posting_times"
+    "\n- engagement_strategies"
+    "\n- visual_elements"
+    "\n- audio_recommendations"
+    "\n- emotional_triggers"
+    "\n- pacing_guide"
+    "\n- effect_recommendations"
+    "\n- viral_potential_score (1-10)"
+    "\n- improvement_suggestions"
+)
+
+@lru_cache(maxsize=256)
+def build_system_prompt(platform, language, theme, tone, target_emotion, length,
+                        content_format, effect_intensity, call_to_action):
+    """Build the system message for a parameter set (cached)"""
+    return (
+        "You are an expert viral content strategist specializing in cutting-edge content optimization. "
+        f"Generate content optimized for {platform.upper()} in {language.upper()}, "
+        f"incorporating {theme.upper()} theme elements with {tone} tone and {target_emotion} emotional impact. "
+        f"Content duration: {LENGTH_GUIDES[length]}, Format: {content_format}, "
+        f"Effect Intensity: {effect_intensity}, Call-to-action: {call_to_action}. "
+        f"Follow platform best practices: {PLATFORM_SPECIFICS[platform]['content_structure']}. "
+        + SYSTEM_PROMPT_SECTIONS
+    )
+
+@metrics.REGISTRY.register_collector
+def _prompt_cache_metrics():
+    info = build_system_prompt.cache_info()
+    lookups = metrics.Counter("viral_prompt_cache_lookups_total", "System prompt cache lookups", ("result",))
+    lookups.inc(info.hits, result="hit")
+    lookups.inc(info.misses, result="miss")
+    size = metrics.Gauge("viral_prompt_cache_size", "System prompts currently cached")
+    size.set(info.currsize)
+    return [lookups, size]
+
+def estimate_tokens(text):
+    """Cheap token estimate based on character count"""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?…])\s+|\n+')
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# Transcriptions are mostly English or French; filler words carry no salience
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his i if in into is it its
+just like me my of on or our she so that the their them there they this to was we
+were what when which who will with you your yeah um uh okay ok
+au aux avec ce ces dans de des du elle en est et eux il ils je la le les leur lui
+ma mais me mes moi mon ne nous on ou par pas pour qu que qui sa se ses son sur ta
+te tes toi ton tu un une vos votre vous c d j l n s t y a ça
+""".split())
+
+def _truncate_words(text, max_chars):
+    """Cut text at a word boundary so it fits within max_chars"""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(' ', 1)[0]
+    return cut or text[:max_chars]
+
+def condense_transcript(text, token_budget=None):
+    """
+    Reduce a transcript to fit the token budget using extractive summarization.
+
+    Sentences are scored by the average frequency of their content words
+    across the whole transcript, with a small bonus for the opening sentence
+    (usually the hook). The highest scoring sentences are kept, in their
+    original order, until the budget is spent.
+    """
+    if token_budget is None:
+        token_budget = TRANSCRIPT_TOKEN_BUDGET
+    text = (text or "").strip()
+    if estimate_tokens(text) <= token_budget:
+        return text
+
+    max_chars = token_budget * CHARS_PER_TOKEN
+    sentences = [s.strip() for s in _SENTENCE_SPLIT.split(text) if s and s.strip()]
+    if len(sentences) <= 1:
+        return _truncate_words(text, max_chars)
+
+    sentence_words = [
+        [w for w in _WORD.findall(s.lower()) if w not in STOPWORDS and not w.isdigit()]
+        for s in sentences
+    ]
+    frequencies = Counter(w for words in sentence_words for w in words)
+    top_frequency = max(frequencies.values(), default=1)
+
+    scores = []
+    for index, words in enumerate(sentence_words):
+        score = sum(frequencies[w] for w in words) / (top_frequency * len(words)) if words else 0.0
+        if index == 0:
+            score += 0.5
+        scores.append((score, index))
+
+    selected = []
+    used_chars = 0
+    for score, index in sorted(scores, key=lambda item: (-item[0], item[1])):
+        sentence = sentences[index]
+        cost = len(sentence) + 1
+        if used_chars + cost > max_chars:
+            continue
+        selected.append(index)
+        used_chars += cost
+
+    if not selected:
+        return _truncate_words(sentences[0], max_chars)
+
+    condensed = " ".join(sentences[i] for i in sorted(selected))
+    logger.info(
+        f"Condensed transcription from ~{estimate_tokens(text)} to ~{estimate_tokens(condensed)} tokens "
+        f"({len(selected)}/{len(sentences)} sentences)"
+    )
+    return condensed
+
+def build_user_prompt(theme, file_type, platform, length, content_format,
+                      target_emotion, call_to_action, effect_intensity, transcription=None):
+    """Build the user message, fitting the transcription into the token budget"""
+    user_content = [
+        f"Create viral content for {file_type} with theme '{theme}'.",
+        f"Optimize for {platform} using {THEME_STRATEGIES[theme]['storytelling']}.",
+        f"Format: {FORMAT_STRATEGIES[content_format]['structure']}.",
+        f"Emotional impact: {EMOTION_STRATEGIES[target_emotion]['tone']}.",
+        f"Effect intensity: {THEME_STRATEGIES[theme]['effect_intensities'][effect_intensity][0]}.",
+        f"Call-to-action focus: {call_to_action}.",
+        f"Target length: {LENGTH_GUIDES[length]}.",
+    ]
+
+    if transcription:
+        user_content.append(f"Context from transcription: '{condense_transcript(transcription)}'")
+
+    return " ".join(user_content)
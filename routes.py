@@ -1,10 +1,16 @@
 import os
 import json
+import base64
 import logging
-from flask import render_template, request, jsonify, send_from_directory, abort
+from datetime import datetime
+from flask import render_template, request, jsonify, send_from_directory, abort, Response
 from werkzeug.exceptions import RequestEntityTooLarge
+from sqlalchemy import and_, or_
 from app import app, db
-from models import Content
+from models import Content, Profile, get_or_create_generation
+import metrics
+import profiling
+import artifacts
 from utils import allowed_file, generate_secure_filename, generate_viral_content, transcribe_audio
 from media_utils import (
     extract_audio_from_video,
@@ -33,7 +39,14 @@ def index():
 def handle_file_too_large(e):
     return jsonify({'error': 'File size exceeds the 32MB limit'}), 413
 
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/upload', methods=['POST'])
+@metrics.track_request('upload')
+@profiling.profiled
+@artifacts.job()
 def upload_file():
     try:
         logger.info("Starting file upload process")
@@ -70,7 +83,10 @@ def upload_file():
             filename = generate_secure_filename(file.filename)
             file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
             logger.info(f"Saving file to: {file_path}")
-            file.save(file_path)
+            artifacts.register(file_path, 'upload')
+            with metrics.stage('save'):
+                file.save(file_path)
+            metrics.STAGE_BYTES_OUT.inc(os.path.getsize(file_path), stage='save')
             
             file_type = file.filename.rsplit('.', 1)[1].lower()
             
@@ -92,10 +108,12 @@ def upload_file():
                 if file_info['file_type'] == 'mp4':
                     audio_path = extract_audio_from_video(file_info['original_path'])
                     if audio_path:
-                        transcription = transcribe_audio(audio_path)
+                        with metrics.stage('transcription'):
+                            transcription = transcribe_audio(audio_path)
                         transcriptions.append(transcription)
                 elif file_info['file_type'] == 'mp3':
-                    transcription = transcribe_audio(file_info['original_path'])
+                    with metrics.stage('transcription'):
+                        transcription = transcribe_audio(file_info['original_path'])
                     transcriptions.append(transcription)
             except Exception as e:
                 logger.error(f"Error getting transcription: {str(e)}")
@@ -103,19 +121,20 @@ def upload_file():
 
         # Generate content using combined transcriptions
         combined_transcription = " ".join(transcriptions) if transcriptions else None
-        generated_content = generate_viral_content(
-            theme=theme,
-            file_type=uploaded_files[0]['file_type'] if uploaded_files else 'mp4',
-            tone=tone,
-            platform=platform,
-            length=length,
-            language=language,
-            transcription=combined_transcription,
-            content_format=content_format,
-            target_emotion=target_emotion,
-            call_to_action=call_to_action,
-            effect_intensity=intensity
-        )
+        with metrics.stage('generation'):
+            generated_content = generate_viral_content(
+                theme=theme,
+                file_type=uploaded_files[0]['file_type'] if uploaded_files else 'mp4',
+                tone=tone,
+                platform=platform,
+                length=length,
+                language=language,
+                transcription=combined_transcription,
+                content_format=content_format,
+                target_emotion=target_emotion,
+                call_to_action=call_to_action,
+                effect_intensity=intensity
+            )
         
         try:
             content_data = json.loads(generated_content)
@@ -194,7 +213,8 @@ def upload_file():
         if not processed_files:
             return jsonify({'error': 'No files were successfully processed'}), 400
         
-        # Save to database
+        # Save to database; the generated content is stored once for the batch
+        generation = get_or_create_generation(generated_content, theme)
         content_entries = []
         for file_info in processed_files:
             processed_filename = os.path.basename(file_info['processed_path']) if file_info['processed_path'] else None
@@ -203,13 +223,15 @@ def upload_file():
             new_content.stored_filename = file_info['filename']
             new_content.file_type = file_info['file_type']
             new_content.theme = theme
-            new_content.generated_content = generated_content
+            new_content.generation = generation
             new_content.processed_filename = processed_filename
             
             db.session.add(new_content)
             content_entries.append(new_content)
             
-        db.session.commit()
+        with metrics.stage('db_commit'):
+            db.session.commit()
+        profiling.attach(content_entries)
         logger.info(f"Content saved to database")
         
         return jsonify({
@@ -230,6 +252,55 @@ def upload_file():
         logger.error(f"Error in upload process: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def encode_cursor(content):
+    raw = json.dumps([content.created_at.isoformat(), content.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+    created_at, content_id = json.loads(raw)
+    return datetime.fromisoformat(created_at), int(content_id)
+
+@app.route('/content')
+def list_content():
+    """Content history, newest first, paginated by an opaque (created_at, id) cursor"""
+    try:
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        query = Content.query
+        theme = request.args.get('theme')
+        if theme:
+            query = query.filter(Content.theme == theme)
+
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                created_at, content_id = decode_cursor(cursor)
+            except (ValueError, TypeError):
+                return jsonify({'error': 'Invalid cursor'}), 400
+            query = query.filter(or_(
+                Content.created_at < created_at,
+                and_(Content.created_at == created_at, Content.id < content_id)
+            ))
+
+        rows = query.order_by(Content.created_at.desc(), Content.id.desc()).limit(limit + 1).all()
+        page = rows[:limit]
+        return jsonify({
+            'items': [{
+                'id': content.id,
+                'original_filename': content.original_filename,
+                'file_type': content.file_type,
+                'theme': content.theme,
+                'processed_filename': content.processed_filename,
+                'generation_id': content.generation_id,
+                'created_at': content.created_at.isoformat() if content.created_at else None,
+                'preview_url': f'/preview/{content.id}'
+            } for content in page],
+            'next_cursor': encode_cursor(page[-1]) if len(rows) > limit else None
+        })
+    except Exception as e:
+        logger.error(f"Error listing content: {str(e)}")
+        return jsonify({'error': 'Error loading content history'}), 500
+
 @app.route('/preview/<int:content_id>')
 def preview_content(content_id):
     try:
@@ -252,3 +323,35 @@ def download_file(content_id):
     except Exception as e:
         logger.error(f"Error downloading content {content_id}: {str(e)}")
         return jsonify({'error': 'Error downloading file'}), 500
+
+@app.route('/admin/profiles')
+def list_profiles():
+    if not profiling.is_authorized(request):
+        abort(403)
+    profiles = Profile.query.order_by(Profile.created_at.desc()).limit(100).all()
+    content_ids = {}
+    linked = (db.session.query(Content.profile_id, Content.id)
+              .filter(Content.profile_id.in_([profile.id for profile in profiles]))
+              .order_by(Content.id))
+    for profile_id, content_id in linked:
+        content_ids.setdefault(profile_id, []).append(content_id)
+    return jsonify([{
+        'id': profile.id,
+        'content_ids': content_ids.get(profile.id, []),
+        'request_id': profile.request_id,
+        'wall_time': profile.wall_time,
+        'ffmpeg_stats': json.loads(profile.ffmpeg_stats) if profile.ffmpeg_stats else [],
+        'created_at': profile.created_at.isoformat() if profile.created_at else None,
+        'download_url': f'/admin/profiles/{profile.id}'
+    } for profile in profiles])
+
+@app.route('/admin/profiles/<int:profile_id>')
+def download_profile(profile_id):
+    if not profiling.is_authorized(request):
+        abort(403)
+    profile = Profile.query.get_or_404(profile_id)
+    return send_from_directory(
+        os.path.abspath(profiling.PROFILES_DIR),
+        profile.filename,
+        as_attachment=True
+    )